@@ -1,35 +1,141 @@
-from typing import Optional
+from typing import Any, Iterable, Optional, Union
 from abc import ABC, abstractmethod
+from array import array
+from string import Formatter
+import functools
+import re
 import sys
 
+def _intern(name: str) -> Optional[str]:
+    return sys.intern(name) if name else None
+
 class Card:
+    __slots__ = (
+        "symbol", "command", "command_norm", "argument", "argument_norm",
+        "_arg_parts", "comment", "number", "is_noop"
+    )
+    
     symbol: Optional[str]
     command: Optional[str]
+    command_norm: Optional[str]
     argument: Optional[str]
+    argument_norm: Optional[str]
+    _arg_parts: Optional[list[str]]
     comment: Optional[str]
     number: Optional[str]
+    is_noop: bool
     
     def __init__(self, text: str):
-        full_card = '{:<80}'.format(text[:80])
-        
-        self.symbol = full_card[0:8].rstrip() or None
-        
-        if full_card[8] == '*':
-            self.comment = full_card[9:72].rstrip() or None
-            self.command = None
-            self.argument = None
-        
-        else:
-            self.comment = full_card[48:72].rstrip() or None
-            self.command = full_card[9:17].rstrip() or None
-            self.argument = full_card[17:48].rstrip() or None
+        self.symbol = _intern(text[0:8].rstrip())
+        self.number = text[72:80].rstrip()
+        if text[8:9] == '*':
+            # comment card
+            self.comment = text[9:72].rstrip() or None
+            self.set_instruction(None, None)
+            self.is_noop = self.symbol is None
+            return
         
-        self.number = full_card[72:80].rstrip()
+        self.comment = text[48:72].rstrip() or None
+        self.set_instruction(
+            text[9:17].rstrip() or None,
+            text[17:48].rstrip() or None
+        )
+        self.is_noop = self.symbol is None and self.command is None
+    
+    def set_instruction(
+        self,
+        command: Optional[str],
+        argument: Optional[str]
+    ):
+        self.command = command
+        self.argument = argument
+        self.argument_norm = argument.strip() if argument else None
+        self._arg_parts = None
+        self.command_norm = (
+            sys.intern(command.strip().upper()) if command else None
+        )
+    
+    @property
+    def arg_parts(self) -> list[str]:
+        if self._arg_parts is None:
+            self._arg_parts = self.argument_norm.split(",")
+        return self._arg_parts
+    
+    @classmethod
+    def parse_many(cls, text: str) -> list["Card"]:
+        return [
+            cls(line) for line in text.splitlines()
+            if line and not line.isspace()
+        ]
+
+_PREFIX_MODES = {
+    '_': 1, # direct page
+    '.': 2, # relative
+}
+
+_SUFFIX_MODES = {
+    '+': 14, # A13++
+    '-': 15, # --A13
+}
+
+_MODE_BITS = tuple(mode << 18 for mode in range(16))
+_INDIRECT = 1 << 22
+_DISP_MASK = 0o777777
+
+_OPERAND_RE = re.compile(r"""
+    (@)?                    # indirect
+    (?:
+        ([_.])(.+)          # direct page or PC relative
+      | ([^(]+?)            # displacement, then
+        (?:\((.*)|([+-]))?  # index register or A13 inc/dec
+    )
+""", re.VERBOSE)
+
+@functools.lru_cache(maxsize=2048)
+def _parse_literal(arg: str, mask: int = -1) -> int:
+    """
+    Leading zero for octal, leading any other digit for decimal
+    """
+    return int(arg, 8 if arg.startswith(('0', '-0')) else 10) & mask
+
+@functools.lru_cache(maxsize=None)
+def parse_operand(arg: str) -> tuple[int, bool, Optional[int], Optional[str]]:
+    """
+    Split an operand into (mode, indirect, displacement, label). Exactly
+    one of displacement and label is None. Operand strings repeat heavily
+    across a program, so the parse is cached by text.
+    """
+    m = _OPERAND_RE.fullmatch(arg.strip())
+    if m is None:
+        raise ValueError("Syntax error")
+    indirect, prefix, prefixed, arg, index, suffix = m.groups()
+    
+    if prefix:
+        mode = _PREFIX_MODES[prefix]
+        arg = prefixed
+    elif index is not None:
+        mode = int(index.rstrip(')')) # indexed
+        if mode > 13 or mode < 3:
+            raise ValueError("No such index register")
+    elif suffix:
+        mode = _SUFFIX_MODES[suffix]
+    else:
+        mode = 0 # absolute
+    
+    if arg[0] in '0123456789-':
+        return mode, bool(indirect), _parse_literal(arg, _DISP_MASK), None
+    else:
+        return mode, bool(indirect), None, sys.intern(arg)
+
+# (block, index, label, base, mask): block[index] |= (label - base) & mask
+Reloc = tuple[array, int, str, int, int]
 
 def generate_address(
     arg: str,
-    symbols: Optional[dict[str, int]] = None,
-    pc: int = 0
+    pc: int,
+    symbols: dict[str, int],
+    out: array,
+    relocs: list[Reloc]
 ) -> int:
     """
     123456          displacement only
@@ -41,62 +147,36 @@ def generate_address(
     @               indirect
     Leading zero for octal, leading any other digit for decimal
     Leading letter for label
-    """
-    arg = arg.strip()
-    if arg[0] == '@':
-        indirect = True
-        arg = arg[1:]
-    else:
-        indirect = False
-    
-    if arg[0] == '_':
-        mode = 1 # direct page
-        arg = arg[1:]
-    elif arg[0] == '.':
-        mode = 2 # relative
-        arg = arg[1:]
-    elif len(arg.split('(')) == 2:
-        args = arg.split('(') # indexed
-        mode = int(args[1].rstrip(')'))
-        if mode > 13 or mode < 3:
-            raise ValueError("No such index register")
-        arg = args[0]
-    elif arg[-1] == '+':
-        mode = 14 # A13++
-        arg = arg[:-1]
-    elif arg[-1] == '-':
-        mode = 15 # --A13
-        arg = arg[:-1]
-    else:
-        mode = 0 # absolute
     
-    if arg[0] == '0' or arg[0:2] == '-0':
-        disp = int(arg, 8) & 0o777777
-    elif arg[0] in '0123456789-':
-        disp = int(arg, 10) & 0o777777
-    else:
-        label = symbols[arg]
-        if mode == 2:
-            label -= pc
-        disp = label & 0o777777
+    A label that is already defined resolves immediately. A forward
+    reference leaves the displacement zero and records a relocation
+    against the next word appended to out, to be patched by relocate().
+    """
+    mode, indirect, disp, label = parse_operand(arg)
+    if label is not None:
+        base = pc if mode == 2 else 0
+        if label in symbols:
+            disp = (symbols[label] - base) & _DISP_MASK
+        else:
+            relocs.append((out, len(out), label, base, _DISP_MASK))
+            disp = 0
     
-    result = (mode << 18) | disp
+    result = _MODE_BITS[mode] | disp
     if indirect:
-        result |= 1 << 22
+        result |= _INDIRECT
     return result
 
 class AssemblerModule(ABC):
-    @abstractmethod
-    def size(self, card: Card) -> int:
-        pass
-        
     @abstractmethod
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
         pass
     
     opcodes: dict[str, int]
@@ -105,185 +185,176 @@ class AssemblerModule(ABC):
     def __init__(self):
         self.opcodes = {}
     
-    def will_assemble(self, card: Card) -> bool:
-        return (card.command.strip().upper() in self.opcodes)
+    def mnemonics(self) -> Iterable[str]:
+        return self.opcodes.keys()
+    
+    def encoding(self, mnemonic: str) -> Any:
+        # precomputed per-mnemonic data, handed back to assemble()
+        return self.opcodes[mnemonic]
+
+_MR_OPS = {
+    "B": 0,
+    "BL": 1,
+    "ITN": 2,
+    "DTN": 3,
+    "TMN": 4,
+    "TMZ": 5,
+    
+    "M": 0x10,
+    "MA": 0x11,
+    "MNA": 0x12,
+    "D": 0x13,
+    "MU": 0x14,
+    "MAU": 0x15,
+    "MNAU": 0x16,
+    "DU": 0x17,
+    
+    "BSM": 0xE,
+    "BRM": 0xF,
+    
+    "SLR": 0x87,
+    
+    "RFI": 0x80,
+    "RLMSK": 0x81,
+    "LMSK": 0x82,
+    "MWAIT": 0x83,
+    "STMSK": 0x84,
+    "INVSM": 0x85,
+    "INVPG": 0x86,
+}
 
-class AssembleMR(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 1
+_AM_OPS = {
+    "EDIT": 0o041,
+    "EDITS": 0o042,
     
-    def assemble(
-        self,
-        card: Card,
-        symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        address = generate_address(card.argument.strip(), symbols, pc)
-        return [(self.opcodes[card.command.strip().upper()] << 23) | address]
+    "LX": 0o043,
+    "AX": 0o044,
     
-    def __init__(self):
-        self.opcodes = {
-            "B": 0,
-            "BL": 1,
-            "ITN": 2,
-            "DTN": 3,
-            "TMN": 4,
-            "TMZ": 5,
-            
-            "M": 0x10,
-            "MA": 0x11,
-            "MNA": 0x12,
-            "D": 0x13,
-            "MU": 0x14,
-            "MAU": 0x15,
-            "MNAU": 0x16,
-            "DU": 0x17,
-            
-            "BSM": 0xE,
-            "BRM": 0xF,
-            
-            "SLR": 0x87,
-            
-            "RFI": 0x80,
-            "RLMSK": 0x81,
-            "LMSK": 0x82,
-            "MWAIT": 0x83,
-            "STMSK": 0x84,
-            "INVSM": 0x85,
-            "INVPG": 0x86,
-        }
-
-class AssembleAM(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 1
+    "ITNE": 0o045,
+    "DTNE": 0o046,
+    
+    "LXH": 0o047,
+    
+    "LCM": 0o050,
+    "LN": 0o051,
+    "L": 0o052,
+    "ST": 0o053,
+    
+    "AC": 0o054,
+    "S": 0o055,
+    "A": 0o056,
+    "AN": 0o057,
+    "O": 0o062,
+    "X": 0o066,
+    
+    "WAIT": 0o070,
+    "INT": 0o071,
+    
+    "LSK": 0o072,
+    "STSK": 0o073,
     
+    "LCTL": 0o074,
+    "STCTL": 0o075,
+    "LXRT": 0o076,
+}
+
+class AssembleMemory(AssemblerModule):
+    """
+    Memory-reference forms: MR (address only) and AM (register, address)
+    """
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        args = card.argument.strip().split(",")
-        if len(args) == 2:
-            register = int(args[0])
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
+        word, has_register = encoding
+        left, sep, right = card.argument_norm.partition(",")
+        if sep:
+            if not has_register or "," in right:
+                raise ValueError("Syntax error")
+            register = int(left)
             if register < 0 or register > 15:
                 raise ValueError("No such register")
-        elif len(args) == 1:
-            register = 0
-        else:
-            raise ValueError("Syntax error")
-            
-        address = generate_address(args[-1], symbols, pc)
-        return [(
-            (self.opcodes[card.command.strip().upper()] << 27)
-            | (register << 23)
-            | address
-        )]
+            word |= register << 23
+            left = right
+        
+        out.append(word | generate_address(left, pc, symbols, out, relocs))
+        return pc + 1
     
     def __init__(self):
-        self.opcodes = {
-            "EDIT": 0o041,
-            "EDITS": 0o042,
-            
-            "LX": 0o043,
-            "AX": 0o044,
-            
-            "ITNE": 0o045,
-            "DTNE": 0o046,
-            
-            "LXH": 0o047,
-            
-            "LCM": 0o050,
-            "LN": 0o051,
-            "L": 0o052,
-            "ST": 0o053,
-            
-            "AC": 0o054,
-            "S": 0o055,
-            "A": 0o056,
-            "AN": 0o057,
-            "O": 0o062,
-            "X": 0o066,
-
-            "WAIT": 0o070,
-            "INT": 0o071,
-            
-            "LSK": 0o072,
-            "STSK": 0o073,
-            
-            "LCTL": 0o074,
-            "STCTL": 0o075,
-            "LXRT": 0o076,
-        }
+        # mnemonic -> (pre-shifted opcode word, takes a register)
+        self.layout = {k: (v << 23, False) for k, v in _MR_OPS.items()}
+        self.layout.update(
+            {k: (v << 27, True) for k, v in _AM_OPS.items()}
+        )
+        self.opcodes = {**_MR_OPS, **_AM_OPS}
+    
+    def encoding(self, mnemonic: str) -> tuple[int, bool]:
+        return self.layout[mnemonic]
+
+_FM_OPS = {
+    "LF": 0o400,
+    "STF": 0o401,
+    "AF": 0o402,
+    "SF": 0o403,
+    "MF": 0o404,
+    "DF": 0o405,
+    
+    "LG": 0o406,
+    "STG": 0o407,
+    "AG": 0o410,
+    "SG": 0o411,
+    "MG": 0o412,
+    "DG": 0o413,
+    
+    "LE": 0o414,
+    "STE": 0o415,
+    "LS": 0o416,
+    "STS": 0o417,
+}
 
 class AssembleFM(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 1
-    
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        args = card.argument.strip().split(",")
-        if len(args) == 2:
-            register = int(args[0])
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
+        left, sep, right = card.argument_norm.partition(",")
+        if sep:
+            if "," in right:
+                raise ValueError("Syntax error")
+            register = int(left)
             if register < 0 or register > 3:
                 raise ValueError("No such FPU register")
-        elif len(args) == 1:
-            register = 0
+            address = generate_address(right, pc, symbols, out, relocs)
         else:
-            raise ValueError("Syntax error")
-            
-        address = generate_address(args[-1], symbols, pc)
-        
-        upper_cmd = card.command.strip().upper()
-        
-        extra_bits = 0
-        if upper_cmd[-2:] == "NR":
-            extra_bits = 3
-            upper_cmd = upper_cmd[0:-2]
-        elif upper_cmd[-1:] == "R" or upper_cmd[-1:] == "N":
-            extra_bits = {"R": 1, "N": 2}[upper_cmd[-1:]]
-            upper_cmd = upper_cmd[0:-1]
+            register = 0
+            address = generate_address(left, pc, symbols, out, relocs)
         
-        return [(
-            (self.opcodes[upper_cmd] << 27)
-            | (extra_bits << 25)
-            | (register << 23)
-            | address
-        )]
-    
-    def will_assemble(self, card: Card) -> bool:
-        upper_cmd = card.command.strip().upper()
-        if upper_cmd[-2:] == "NR":
-            upper_cmd = upper_cmd[0:-2]
-        elif upper_cmd[-1:] == "N" or upper_cmd[-1:] == "R":
-            upper_cmd = upper_cmd[0:-1]
-    
-        return (upper_cmd in self.opcodes)
+        out.append(encoding | (register << 23) | address)
+        return pc + 1
+    
+    def mnemonics(self) -> Iterable[str]:
+        return self.words.keys()
+    
+    def encoding(self, mnemonic: str) -> int:
+        return self.words[mnemonic]
     
     def __init__(self):
-        self.opcodes = {
-            "LF": 0o400,
-            "STF": 0o401,
-            "AF": 0o402,
-            "SF": 0o403,
-            "MF": 0o404,
-            "DF": 0o405,
-            
-            "LG": 0o406,
-            "STG": 0o407,
-            "AG": 0o410,
-            "SG": 0o411,
-            "MG": 0o412,
-            "DG": 0o413,
-            
-            "LE": 0o414,
-            "STE": 0o415,
-            "LS": 0o416,
-            "STS": 0o417,
+        self.opcodes = _FM_OPS
+        
+        self.words = {
+            op + suffix: (v << 27) | (extra_bits << 25)
+            for op, v in self.opcodes.items()
+            for suffix, extra_bits in (("", 0), ("R", 1), ("N", 2), ("NR", 3))
         }
 
 def get_paren_arg(arg: str) -> str:
@@ -292,56 +363,72 @@ def get_paren_arg(arg: str) -> str:
 
 def get_paren_number(arg: str) -> int:
     contents = get_paren_arg(arg)
-    if contents[0] == '0' or contents[0:2] == '-0':
-        return int(contents, 8) & 0o777777777
-    elif contents[0] in '0123456789-':
-        return int(contents, 10) & 0o777777777
+    if contents[0] in '0123456789-':
+        return _parse_literal(contents, 0o777777777)
+
+_AA_ARG_TBL = {
+    #       fn                bits shl extra
+    
+    "NL":   (None,             0,   0,  1 << 31),
+    
+    "CC":   (None,             0,   0,  1 << 18),
+    "SC":   (None,             0,   0,  2 << 18),
+    "CMC":  (None,             0,   0,  3 << 18),
+    
+    "TNV":  (None,             0,   0,  1 << 15),
+    "TCN":  (None,             0,   0,  2 << 15),
+    "TCZ":  (None,             0,   0,  3 << 15),
+    "TRN":  (None,             0,   0,  4 << 15),
+    "TRZ":  (None,             0,   0,  5 << 15),
+    "TCRN": (None,             0,   0,  6 << 15),
+    "TCRZ": (None,             0,   0,  7 << 15),
+    
+    "M":    (get_paren_number, 6,   6,  0      ),
+    "MR":   (get_paren_number, 6,   6,  0x1000 ),
+    "R":    (get_paren_number, 6,   0,  0      ),
+    "RC":   (get_paren_number, 6,   0,  0x2000 ),
+    "RR":   (get_paren_number, 6,   0,  0x1000 ),
+    "I":    (get_paren_number, 13,  0,  0x6000 ),
+    "D":    (get_paren_number, 4,   6,  0x4000 ),
+}
 
 def assemble_aa_arg(arg: str) -> int:
-    def static(x):
-        return lambda y: x
-        
-    args_tbl = {
-        #       fn                bits shl extra
-        
-        "M": (get_paren_number, 6,   6,  0         ),
-        "MR": (get_paren_number, 6,   6,  0x1000   ),
-        "R": (get_paren_number, 6,   0,  0         ),
-        "RC": (get_paren_number, 6,   0,  0x2000),
-        "RR": (get_paren_number, 6,   0,  0x1000),
-        "I": (get_paren_number, 13,   0,  0x6000),
-        "D": (get_paren_number, 4,   6,  0x4000),
-        
-        "NL": (static(1),        1,   31, 0         ),
-        
-        "CC": (static(1),        2,   18, 0         ),
-        "SC": (static(2),        2,   18, 0         ),
-        "CMC": (static(3),        2,   18, 0         ),
-        
-        "TNV": (static(1),        3,   15, 0         ),
-        "TCN": (static(2),        3,   15, 0         ),
-        "TCZ": (static(3),        3,   15, 0         ),
-        "TRN": (static(4),        3,   15, 0         ),
-        "TRZ": (static(5),        3,   15, 0         ),
-        "TCRN": (static(6),        3,   15, 0         ),
-        "TCRZ": (static(7),        3,   15, 0         ),
-    }
-    
+    """
+    A None fn marks a constant flag, already encoded in extra
+    """
     argspl = arg.split("(")[0]
-    fn, bits, shl, extra = args_tbl[argspl.upper()]
-    return ((fn(arg.strip()[len(argspl):]) & ((1 << bits) - 1)) << shl) | extra
+    fn, bits, shl, extra = _AA_ARG_TBL[argspl.upper()]
+    if fn is None:
+        return extra
+    
+    value = fn(arg.strip()[len(argspl):])
+    return ((value & ((1 << bits) - 1)) << shl) | extra
+
+_AA_OPS = {
+    "CMA": 0xE0,
+    "NA": 0xE1,
+    "LA": 0xE2,
+    "IA": 0xE3,
+    "ACA": 0xE4,
+    "SA": 0xE5,
+    "AA": 0xE6,
+    "ANA": 0xE7,
+    "OA": 0xF2,
+    "XA": 0xF6,
+    "PCTA": 0xF7,
+}
 
 class AssembleAA(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 1
-    
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        args = card.argument.strip().split(",")
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
+        args = card.arg_parts
         if len(args) >= 2:
             src = int(args[0])
             tgt = int(args[1])
@@ -350,64 +437,69 @@ class AssembleAA(AssemblerModule):
             result = (src << 27) | (tgt << 23)
             for arg in args[2:]:
                 result |= assemble_aa_arg(arg)
-            opcode = self.opcodes[card.command.strip().upper()]
-            opcode_split = ((opcode >> 4) << 32) | ((opcode & 7) << 20)
-            return [result | opcode_split]
+            out.append(result | encoding)
+            return pc + 1
         else:
             raise ValueError("Syntax error")
 
         
     def __init__(self):
-        self.opcodes = {
-            "CMA": 0xE0,
-            "NA": 0xE1,
-            "LA": 0xE2,
-            "IA": 0xE3,
-            "ACA": 0xE4,
-            "SA": 0xE5,
-            "AA": 0xE6,
-            "ANA": 0xE7,
-            "OA": 0xF2,
-            "XA": 0xF6,
-            "PCTA": 0xF7,
+        self.opcodes = _AA_OPS
+        
+        self.words = {
+            k: ((v >> 4) << 32) | ((v & 7) << 20)
+            for k, v in self.opcodes.items()
         }
+    
+    def encoding(self, mnemonic: str) -> int:
+        return self.words[mnemonic]
 
-    def will_assemble(self, card: Card) -> bool:
-        return (card.command.strip().upper()[0:4] in self.opcodes)
+_FR_STATIC = {
+    #       encoded
+    
+    "NL": 1 << 22,
+    
+    "TNV": 1 << 15,
+    "TRL": 2 << 15,
+    "TRG": 3 << 15,
+    "TRN": 4 << 15,
+    "TRZ": 5 << 15,
+    "TINF": 6 << 15,
+    "TNAN": 7 << 15,
+}
 
 def assemble_fr_arg(arg: str) -> int:
-    def static(x):
-        return lambda y: x
-        
-    args_tbl = {
-        #       fn                bits shl extra
+    return _FR_STATIC[arg.split("(")[0].upper()]
+
+_FR_OPS = {
+    "LL": 0o440,
+    "NL": 0o441,
+    "AL": 0o442,
+    "SL": 0o443,
+    "ML": 0o444,
+    "DL": 0o445,
+}
 
-        "NL": (static(1),        1,   22, 0         ),
-        
-        "TNV": (static(1),        3,   15, 0         ),
-        "TRL": (static(2),        3,   15, 0         ),
-        "TRG": (static(3),        3,   15, 0         ),
-        "TRN": (static(4),        3,   15, 0         ),
-        "TRZ": (static(5),        3,   15, 0         ),
-        "TINF": (static(6),        3,   15, 0         ),
-        "TNAN": (static(7),        3,   15, 0         ),
-    }
-    
-    argspl = arg.split("(")[0]
-    fn, bits, shl, extra = args_tbl[argspl.upper()]
-    return ((fn(arg.strip()[len(argspl):]) & ((1 << bits) - 1)) << shl) | extra
+_FR_EXTENSIONS = {
+    "": 0,
+    "N": 1 << 26,
+    "F": (1 << 25),
+    "G": (1 << 25) | (1 << 14),
+    "NF": (1 << 25) | (1 << 26),
+    "NG": (1 << 25) | (1 << 14) | (1 << 26)
+}
 
 class AssembleFR(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 1
-    
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        args = card.argument.strip().split(",")
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
+        args = card.arg_parts
         if len(args) >= 3:
             src = int(args[0])
             tgt = int(args[1])
@@ -417,49 +509,48 @@ class AssembleFR(AssemblerModule):
             result = (src << 20) | (tgt << 23) | (dst << 18)
             for arg in args[3:]:
                 result |= assemble_fr_arg(arg)
-            opcode = self.opcodes[card.command.strip().upper()[0:2]]
-            ext = self.extensions[card.command.strip().upper()[2:]]
-            return [result | (opcode << 27) | ext]
+            out.append(result | encoding)
+            return pc + 1
         else:
             raise ValueError("Syntax error")
 
         
     def __init__(self):
-        self.opcodes = {
-            "LL": 0o440,
-            "NL": 0o441,
-            "AL": 0o442,
-            "SL": 0o443,
-            "ML": 0o444,
-            "DL": 0o445,
-        }
+        self.opcodes = _FR_OPS
         
-        self.extensions = {
-            "": 0,
-            "N": 1 << 26,
-            "F": (1 << 25),
-            "G": (1 << 25) | (1 << 14),
-            "NF": (1 << 25) | (1 << 26),
-            "NG": (1 << 25) | (1 << 14) | (1 << 26)
+        self.extensions = _FR_EXTENSIONS
+
+        self.words = {
+            op + ext: (v << 27) | bits
+            for op, v in self.opcodes.items()
+            for ext, bits in self.extensions.items()
         }
+    
+    def mnemonics(self) -> Iterable[str]:
+        return self.words.keys()
+    
+    def encoding(self, mnemonic: str) -> int:
+        return self.words[mnemonic]
 
-    def will_assemble(self, card: Card) -> bool:
-        return (
-            (card.command.strip().upper()[0:2] in self.opcodes) and
-            (card.command.strip().upper()[2:] in self.extensions)
-        )
+_BX_OPS = {
+    "LC": 0o100,
+    "STC": 0o101,
+    "ICX": 0o102,
+    "ILC": 0o103,
+    "ISTC": 0o104
+}
 
 class AssembleBX(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 1
-    
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        args = card.argument.strip().split(",")
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
+        args = card.arg_parts
         if len(args) > 1 and len(args) < 4:
             src = int(args[0])
             tgt = int(args[1])
@@ -470,98 +561,99 @@ class AssembleBX(AssemblerModule):
             else:
                 bs = 0
 
-            opcode = self.opcodes[card.command.strip().upper()]
-            return [(opcode << 27) | (src << 23) | (tgt << 18) | bs]
+            out.append((encoding << 27) | (src << 23) | (tgt << 18) | bs)
+            return pc + 1
         else:
             raise ValueError("Syntax error")
 
         
     def __init__(self):
-        self.opcodes = {
-            "LC": 0o100,
-            "STC": 0o101,
-            "ICX": 0o102,
-            "ILC": 0o103,
-            "ISTC": 0o104
-        }
+        self.opcodes = _BX_OPS
+
+_HELPER0_OPS = {
+    "HLT": 0o070002000001,
+    "BLR": 0o000014000000
+}
 
 class AssembleHelper0(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 1
-    
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
         if card.argument is None:
-            opcode = self.opcodes[card.command.strip().upper()]
-            return [opcode]
+            out.append(encoding)
+            return pc + 1
         else:
             raise ValueError("Syntax error")
 
         
     def __init__(self):
-        self.opcodes = {
-            "HLT": 0o070002000001,
-            "BLR": 0o000014000000
-        }
+        self.opcodes = _HELPER0_OPS
+
+_ESCAPE_RE = re.compile(r"\\(.{0,3})", re.DOTALL)
+
+def _unescape(match: re.Match) -> str:
+    return chr(int(match.group(1), 8))
 
 def ascii7(string: str) -> list[int]:
+    """
+    Pack 7-bit characters five to a word, \\ooo escapes octal codes
+    """
+    string = _ESCAPE_RE.sub(_unescape, string)
+    if string.isascii():
+        data = string.encode("ascii")
+    else:
+        data = bytes(ord(c) & 0x7F for c in string)
+    
     result = []
-    char = 0
-    shamt = 29
-
-    i = 0
-    while i < len(string):
-        if string[i] == "\\":
-            i += 1
-            octal = string[i:i+3]
-            i += 3
-            c = int(octal, 8)
-        else:
-            c = ord(string[i])
-            i += 1
-            
-        char |= (c & 0x7F) << shamt
-        shamt -= 7
-        if shamt < 1:
-            shamt = 29
+    full = len(data) - len(data) % 5
+    for i in range(0, full, 5):
+        a, b, c, d, e = data[i:i + 5]
+        result.append((a << 29) | (b << 22) | (c << 15) | (d << 8) | (e << 1))
+    if full < len(data):
+        a, b, c, d, e = data[full:].ljust(5, b"\0")
+        char = (a << 29) | (b << 22) | (c << 15) | (d << 8) | (e << 1)
+        if char != 0:
             result.append(char)
-            char = 0
-    if char != 0:
-        result.append(char)
     return result
 
+_DATA_OPS = {
+    "DW": 0,
+    "USING": 0,
+    "ASCII": 0
+}
+
 class AssembleData(AssemblerModule):
-    def size(self, card: Card) -> int:
-        if card.command == "ASCII":
-            return len(ascii7(card.argument.rstrip()))
-        elif card.command == "USING":
-            return 1
-        else:
-            args = card.argument.strip().split(",")
-            return len(args)
-    
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        command = card.command.strip().upper()
-        args = card.argument.strip().split(",")
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
+        command = card.command_norm
+        args = card.arg_parts
         if command == "DW":
-            result = []
             for arg in args:
-                if arg[0] == '0' or arg[0:2] == '-0':
-                    result.append(int(arg, 8) & 0o777777777777)
-                elif arg[0] in '0123456789-':
-                    result.append(int(arg, 10) & 0o777777777777)
+                if arg[0] in '0123456789-':
+                    out.append(_parse_literal(arg, 0o777777777777))
                 else:
-                    result.append(symbols[arg])
-            return result
+                    label = sys.intern(arg)
+                    if label in symbols:
+                        out.append(symbols[label] & 0o777777777777)
+                    else:
+                        relocs.append(
+                            (out, len(out), label, 0, 0o777777777777)
+                        )
+                        out.append(0)
+            return pc + len(args)
         elif command == "USING":
             result = 0
             for arg in args:
@@ -587,40 +679,51 @@ class AssembleData(AssemblerModule):
                         result |= 1 << (15 - i)
                 else:
                     raise ValueError("Bad USING register")
-            return [result]
+            out.append(result)
+            return pc + 1
         elif command == "ASCII":
-            return ascii7(card.argument.rstrip())
+            words = ascii7(card.argument)
+            out.extend(words)
+            return pc + len(words)
         else:
             raise ValueError("Syntax error")
         
     def __init__(self):
-        self.opcodes = {
-            "DW": 0,
-            "USING": 0,
-            "ASCII": 0
-        }
+        self.opcodes = _DATA_OPS
+
+_IO_OPS = {
+    "NIO": 0x0F,
+    "NIOS": 0x1F,
+    "NIOC": 0x2F,
+    "NIOP": 0x3F,
+    "RIO": 0x00,
+    "RIOS": 0x10,
+    "RIOC": 0x20,
+    "RIOP": 0x30,
+    "WIO": 0x01,
+    "WIOS": 0x11,
+    "WIOC": 0x21,
+    "WIOP": 0x31,
+    "TIONB": 0x0E,
+    "TIOBZ": 0x1E,
+    "TIOND": 0x2E,
+    "TIODN": 0x3E,
+}
 
 class AssembleIO(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 1
-    
     def assemble(
         self,
         card: Card,
+        encoding: Any,
         symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        args = card.argument.strip().split(",")
-        command = card.command.strip().upper()
-        opcode = self.opcodes[command]
-        dev = args[0]
-
-        if dev[0] == '0' or dev[0:2] == '-0':
-           result = int(dev, 8) & 0o7777
-        elif dev[0] in '0123456789-':
-            result = int(dev, 10) & 0o7777
-        
-        result |= (0o640 << 27) | (opcode << 12)
+        pc: int,
+        out: array,
+        relocs: list[Reloc]
+    ) -> int:
+        args = card.arg_parts
+        command = card.command_norm
+        result = _parse_literal(args[0], 0o7777)
+        result |= (0o640 << 27) | (encoding << 12)
         
         if command[0:2] == "WI" or command[0:2] == "RI":
             register = int(args[1])
@@ -633,64 +736,40 @@ class AssembleIO(AssemblerModule):
             
             result |= (register << 23) | (buffer << 13)
         
-        return [result]
+        out.append(result)
+        return pc + 1
         
     def __init__(self):
-        self.opcodes = {
-            "NIO": 0x0F,
-            "NIOS": 0x1F,
-            "NIOC": 0x2F,
-            "NIOP": 0x3F,
-            "RIO": 0x00,
-            "RIOS": 0x10,
-            "RIOC": 0x20,
-            "RIOP": 0x30,
-            "WIO": 0x01,
-            "WIOS": 0x11,
-            "WIOC": 0x21,
-            "WIOP": 0x31,
-            "TIONB": 0x0E,
-            "TIOBZ": 0x1E,
-            "TIOND": 0x2E,
-            "TIODN": 0x3E,
-        }
+        self.opcodes = _IO_OPS
+
+_COMMAND_OPS = {
+    "BSS": 0,
+    "ORIGIN": 0
+}
 
-class AssembleCommand(AssemblerModule):
-    def size(self, card: Card) -> int:
-        return 0
+class AssembleCommand:
+    """
+    BSS and ORIGIN emit no code, they only return the new PC
+    """
+    opcodes: dict[str, int]
     
-    def assemble(
-        self,
-        card: Card,
-        symbols: dict[str, int],
-        pc: int
-    ) -> list[int]:
-        args = card.argument.strip().split(",")
-        result = []
+    def assemble(self, card: Card, pc: int) -> int:
+        args = card.arg_parts
         if len(args) == 1:
-            arg = args[0]
-            if arg[0] == '0' or arg[0:2] == '-0':
-                disp = int(arg, 8)
-            elif arg[0] in '0123456789-':
-                disp = int(arg, 10)
+            disp = _parse_literal(args[0])
             
-            command = card.command.strip().upper()
+            command = card.command_norm
             if command == "BSS":
-                result.append((pc + disp) & 0o777777777)
+                return (pc + disp) & 0o777777777
             elif command == "ORIGIN":
-                result.append(disp & 0o777777777)
+                return disp & 0o777777777
             else:
                 raise ValueError("Syntax error")
-                
-            return result
         else:
             raise ValueError("Syntax error")
         
     def __init__(self):
-        self.opcodes = {
-            "BSS": 0,
-            "ORIGIN": 0
-        }
+        self.opcodes = _COMMAND_OPS
 
 helpers = {
     "NOP": ("LA", "0,0"),
@@ -731,24 +810,52 @@ helpers = {
     "SLR": ("SLR", "0")
 }
 
+def _split_template(template: str) -> tuple[Union[str, int], ...]:
+    """
+    Split a helper template into literal text and argument indices
+    """
+    segments = []
+    auto = 0
+    for literal, field, _, _ in Formatter().parse(template):
+        if literal:
+            segments.append(literal)
+        if field is not None:
+            if field:
+                segments.append(int(field))
+            else:
+                segments.append(auto)
+                auto += 1
+    return tuple(segments)
+
+_HELPER_TEMPLATES = {
+    name: (command, _split_template(template))
+    for name, (command, template) in helpers.items()
+}
+
+# six-bit characters of a word, most significant first
+_SIXBIT_SHIFTS = (30, 24, 18, 12, 6, 0)
+
 class Assembler:
     symbols: dict[str, int]
     pc: int
     cards: list[Card]
     
-    output: dict[int, list[int]]
+    output: dict[int, array]
+    relocs: list[Reloc]
     
     modules: list[AssemblerModule]
+    dispatch: dict[str, tuple[AssemblerModule, Any]]
+    commands: AssembleCommand
     
     def __init__(self, filename: str):
         self.symbols = {}
         self.pc = 0
         self.cards = []
         self.output = {}
+        self.relocs = []
         
         self.modules = [
-            AssembleMR(),
-            AssembleAM(),
+            AssembleMemory(),
             AssembleAA(),
             AssembleBX(),
             AssembleFM(),
@@ -758,83 +865,97 @@ class Assembler:
             AssembleData()
         ]
         
+        self.dispatch = {
+            op: (module, module.encoding(op))
+            for module in self.modules
+            for op in module.mnemonics()
+        }
+        
         self.commands = AssembleCommand()
         
         with open(filename) as file:
-            for line in file:
-                if line.rstrip() != "":
-                    card = Card(line.rstrip())
-                    
-                    command = (
-                        card.command.strip().upper() if card.command else None
+            self.cards = [
+                card for card in Card.parse_many(file.read())
+                if not card.is_noop
+            ]
+        
+        for card in self.cards:
+            command = card.command_norm
+            if command in _HELPER_TEMPLATES:
+                newcmd, segments = _HELPER_TEMPLATES[command]
+                args = card.arg_parts if card.argument else ()
+                card.set_instruction(
+                    newcmd,
+                    "".join(
+                        seg if isinstance(seg, str) else args[seg]
+                        for seg in segments
                     )
-                    if command in helpers:
-                        args = card.argument.strip().split(",") if card.argument else ""
-                        card.command = helpers[command][0]
-                        card.argument = helpers[command][1].format(*args)
-                    
-                    self.cards.append(card)
+                )
     
-    def get_syms(self):
+    def find_module(
+        self,
+        card: Card
+    ) -> Optional[tuple[AssemblerModule, Any]]:
+        return self.dispatch.get(card.command_norm)
+    
+    def emit(self):
+        """
+        Pass 1: define symbols and emit code. Backward label references
+        resolve on the spot; forward ones are left zero and recorded in
+        self.relocs.
+        """
+        current_sym = 0
+        out = None
         for card in self.cards:
             if card.symbol is not None:
+                if card.symbol in self.symbols:
+                    raise ValueError("Duplicate symbol " + card.symbol)
                 self.symbols[card.symbol] = self.pc
         
             if card.command is not None:
-                is_command = True
-                for module in self.modules:
-                    if module.will_assemble(card):
-                        is_command = False
-                        self.pc += module.size(card)
-                if is_command:
-                    self.pc = (
-                        self.commands.assemble(card, self.symbols, self.pc)[0]
+                entry = self.find_module(card)
+                if entry is not None:
+                    module, encoding = entry
+                    if out is None:
+                        out = self.output.get(current_sym)
+                        if out is None:
+                            out = self.output[current_sym] = array('Q')
+                    self.pc = module.assemble(
+                        card, encoding, self.symbols, self.pc, out, self.relocs
                     )
-    
-    def assemble(self):
-        current_sym = 0
-        for card in self.cards:        
-            if card.command is not None:
-                is_command = True
-                for module in self.modules:
-                    if module.will_assemble(card):
-                        self.output[current_sym] = (
-                            self.output.get(current_sym, []) + (
-                                module.assemble(card, self.symbols, self.pc)
-                            )
-                        )
-                        is_command = False
-                        self.pc += module.size(card)
-                if is_command:
+                else:
                     old_pc = self.pc
-                    self.pc = (
-                        self.commands.assemble(card, self.symbols, self.pc)[0]
-                    )
+                    self.pc = self.commands.assemble(card, self.pc)
                     if old_pc != self.pc:
                         current_sym = self.pc
+                        out = None
+    
+    def relocate(self):
+        """
+        Pass 2: patch the forward label references recorded by emit().
+        """
+        symbols = self.symbols
+        for out, index, label, base, mask in self.relocs:
+            out[index] |= (symbols[label] - base) & mask
 
     def print_ppt(self):
-        keys = list(self.output.keys())
-        for k in range(0, len(keys)):
-            blk = keys[k]
-            print(f"{blk:0{9}o}", end = "")
-            for i in self.output[blk]:
-                for sh in range(30, -1, -6):
-                    c = ((i >> sh) & 0o77) + 32
-                    print(chr(c), end = "")
-            if k == len(keys) - 1:
-                print("~")
-            else:
-                print("|", end = "")
+        text = bytearray()
+        for blk, words in self.output.items():
+            if text:
+                text += b"|"
+            text += b"%09o" % blk
+            for i in words:
+                text.extend(((i >> sh) & 0o77) + 32 for sh in _SIXBIT_SHIFTS)
+        if text:
+            text += b"~\n"
+        sys.stdout.buffer.write(text)
     
     def print_c(self):
-        keys = list(self.output.keys())
-        for k in range(0, len(keys)):
-            blk = keys[k]
-            pc = blk
-            for i in self.output[blk]:
-                print(f"    cpu.memory[{pc}] = 0{i:0{12}o};")
-                pc += 1
+        sys.stdout.write("".join(
+            "    cpu.memory[%d] = 0%012o;\n" % (pc, i)
+            for blk, words in self.output.items()
+            for pc, i in enumerate(words, blk)
+        ))
 
     def print_rim(self):
         keys = list(self.output.keys())
@@ -852,8 +973,8 @@ class Assembler:
 
 if __name__ == "__main__":
     assembler = Assembler(sys.argv[1])
-    assembler.get_syms()
-    assembler.assemble()
+    assembler.emit()
+    assembler.relocate()
     if "-c" in sys.argv:
         assembler.print_c()
     elif "-r" in sys.argv: